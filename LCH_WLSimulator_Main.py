@@ -10,6 +10,7 @@ Author: Gary.white; gary.white@opelconsultancy.net
 """
 
 from datetime import datetime
+import numpy as np
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
@@ -17,9 +18,31 @@ import plotly.graph_objects as go
 st.set_page_config(layout="wide")  # Enable full-width layout
 
 # --- Load and Prepare Data ---
-df = pd.read_excel("data_source_branch4.xlsx")
-df.columns = df.columns.str.strip().str.replace(" ", "_").str.replace("(", "").str.replace(")", "")
-df["WeekCommencing"] = pd.to_datetime(df["WeekCommencing"])
+@st.cache_data
+def load_data(path):
+    df = pd.read_excel(path)
+    df.columns = df.columns.str.strip().str.replace(" ", "_").str.replace("(", "").str.replace(")", "")
+    df["WeekCommencing"] = pd.to_datetime(df["WeekCommencing"])
+
+    # The sheet ends with a stray row that has no week or service; with it gone the
+    # counts are whole numbers and downcast to small ints (anything else stays float)
+    df = df.dropna(subset=["WeekCommencing", "Entity"])
+    for col in ["Over52Weeks", "ClockStarts_52+_weeks", "ClockStops_52+_weeks"]:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    df["Entity"] = df["Entity"].astype("category")
+    return df
+
+@st.cache_data
+def load_service_options(path):
+    return [""] + sorted(load_data(path)["Entity"].dropna().unique())
+
+# Shared across sessions, so callers must copy a group before changing it
+@st.cache_resource
+def load_service_groups(path):
+    df = load_data(path).sort_values(["Entity", "WeekCommencing"])
+    return {entity: group for entity, group in df.groupby("Entity", observed=True, sort=False)}
+
+df = load_data("data_source_branch4.xlsx")
 
 # Lock in the untouched baseline BEFORE any resets or initiatives
 df["DoNothingBaseline"] = df["Over52Weeks"].copy()
@@ -32,7 +55,7 @@ if "selected_service" not in st.session_state:
 if st.session_state.selected_service == "":
     st.title("Leeds Community Health Waiting List Simulator")
     st.markdown("Welcome to the simulation tool for projecting >52 week breaches.")
-    service_options = [""] + sorted(df["Entity"].dropna().unique())
+    service_options = load_service_options("data_source_branch4.xlsx")
     selected_service = st.selectbox("🏥 Select a service to view", options=service_options)
     if selected_service:
         st.session_state.selected_service = selected_service
@@ -48,7 +71,7 @@ if st.button("🔙 Back to Landing Page"):
 
 # --- Filter Data for Selected Service ---
 selected_service = st.session_state.selected_service
-service_df = df[df["Entity"] == selected_service].sort_values("WeekCommencing")
+service_df = load_service_groups("data_source_branch4.xlsx")[selected_service].copy()
 today = pd.to_datetime(datetime.today().date())
 historic = service_df[service_df["WeekCommencing"] < today]
 
@@ -60,10 +83,6 @@ st.markdown(f"""<h2 style='font-weight:bold;'>{selected_service} <br>
             &gt;52 Week Waiting List Simulation</h2>""",
             unsafe_allow_html=True)
 
-# --- Percentile Calculation ---
-clock_start_65 = int(historic["ClockStarts"].dropna().quantile(0.65))
-clock_stop_65 = int(historic["ClockStops"].dropna().quantile(0.65))
-
 # --- Sidebar: Initiative Inputs ---
 st.sidebar.header("📌 Capacity Initiatives")
 
@@ -93,15 +112,25 @@ for i in range(5):
 
             initiatives.append(initiative)
 
+# Start/end dates and labels as arrays; open-ended initiatives never end
+initiative_starts = np.array([i["start"] for i in initiatives], dtype="datetime64[ns]")
+initiative_ends = np.array([i.get("end", pd.Timestamp.max) for i in initiatives], dtype="datetime64[ns]")
+initiative_changes = np.array([i["change"] for i in initiatives], dtype=np.int64)
+initiative_labels = [f"{i['name']} ({i['change']:+})" for i in initiatives]
+
+# Rows are weeks, columns are initiatives: True where the initiative is active
+def active_initiatives(weeks, starts, ends):
+    weeks = np.asarray(weeks, dtype="datetime64[ns]")[:, None]
+    return (weeks >= starts) & (weeks <= ends)
+
 # --- Sidebar: Waiting List Resets ---
 st.sidebar.header("🔄 Waiting List Resets")
 
 # Reset 1
 enable_reset_1 = st.sidebar.checkbox("Enable Reset 1", value=False)
 if enable_reset_1:
-    reset_date_1 = st.sidebar.date_input("Reset 1 Date", value=datetime.today(), key="reset_date_1")
-    last_actual_row = service_df[service_df["WeekCommencing"] < today].iloc[-1]
-    default_reset_value_1 = int(last_actual_row["Over52Weeks"])
+    reset_date_1 = st.sidebar.date_input("Reset 1 Date", value=today.date(), key="reset_date_1")
+    default_reset_value_1 = int(historic["Over52Weeks"].iloc[-1])
     reset_value_1 = st.sidebar.number_input("Reset 1 Value", min_value=1, max_value=3000,
                                             value=default_reset_value_1,
                                             step=1,
@@ -113,8 +142,8 @@ else:
 # Reset 2
 enable_reset_2 = st.sidebar.checkbox("Enable Reset 2", value=False)
 if enable_reset_2:
-    reset_date_2 = st.sidebar.date_input("Reset 2 Date", value=datetime.today(), key="reset_date_2")
-    default_reset_value_2 = int(last_actual_row["Over52Weeks"])
+    reset_date_2 = st.sidebar.date_input("Reset 2 Date", value=today.date(), key="reset_date_2")
+    default_reset_value_2 = int(historic["Over52Weeks"].iloc[-1])
     reset_value_2 = st.sidebar.number_input("Reset 2 Value",
                                             min_value=1,
                                             max_value=3000,
@@ -127,89 +156,91 @@ else:
 # --- Baseline Overlay Toggle (placed after resets) ---
 show_baseline = st.sidebar.checkbox("📊 Show 'Do Nothing' Baseline", value=True)
 
-# --- Forecast Simulation with Initiative Effects ---
-def simulate_future(df, weeks_ahead, initiatives):
-    last_actual_row = df[df["WeekCommencing"] < today].iloc[-1]
-    wl = last_actual_row["Over52Weeks"]
+# --- Forecast Simulation: 'Do Nothing' Baseline and With Initiative Effects ---
+def simulate_both(historic, weeks_ahead, starts, ends, changes, resets=()):
+    last_actual_row = historic.iloc[-1]
+    wl_base = wl_init = int(last_actual_row["Over52Weeks"])
     start_date = last_actual_row["WeekCommencing"]
 
-    future_data = []
-    for i in range(weeks_ahead):
-        next_week = start_date + pd.Timedelta(weeks=i+1)
-
-        extended_historic = df[df["WeekCommencing"] < next_week]
-        clock_start_65 = int(extended_historic["ClockStarts_52+_weeks"].dropna().quantile(0.65))
-        clock_stop_65 = int(extended_historic["ClockStops_52+_weeks"].dropna().quantile(0.65))
-
-        adjusted_clock_stop = clock_stop_65
-        for item in initiatives:
-            if item["start"] <= next_week and ("end" not in item or next_week <= item["end"]):
-                adjusted_clock_stop += item["change"]
-
-        if i == 0:
-            adjusted_clock_stop = last_actual_row["ClockStops_52+_weeks"]
-
-        # Apply resets if dates match
-        if reset_date_1 and next_week.date() == reset_date_1:
-            wl = reset_value_1
-        if reset_date_2 and next_week.date() == reset_date_2:
-            wl = reset_value_2
-
-        wl = max(0, wl - adjusted_clock_stop)
-
-        if i < weeks_ahead - 1:
-            wl_next = wl + clock_start_65
-        else:
-            wl_next = wl
-
-        future_data.append({
-            "WeekCommencing": next_week,
-            "Simulated_WaitingList": wl_next
-        })
-
-        wl = wl_next
-
-    return pd.DataFrame(future_data)
-
-# --- Forecast Simulation without Initiative Effects ---
-def simulate_baseline(df, weeks_ahead):
-    last_actual_row = df[df["WeekCommencing"] < today].iloc[-1]
-    wl = last_actual_row["Over52Weeks"]
-    start_date = last_actual_row["WeekCommencing"]
-
-    future_data = []
-    for i in range(weeks_ahead):
-        next_week = start_date + pd.Timedelta(weeks=i+1)
-
-        extended_historic = df[df["WeekCommencing"] < next_week]
-        clock_start_65 = int(extended_historic["ClockStarts_52+_weeks"].dropna().quantile(0.65))
-        clock_stop_65 = int(extended_historic["ClockStops_52+_weeks"].dropna().quantile(0.65))
-
-        adjusted_clock_stop = clock_stop_65
-        if i == 0:
-            adjusted_clock_stop = last_actual_row["ClockStops_52+_weeks"]
-
-        wl = max(0, wl - adjusted_clock_stop)
-
-        if i < weeks_ahead - 1:
-            wl_next = wl + clock_start_65
-        else:
-            wl_next = wl
-
-        future_data.append({
-            "WeekCommencing": next_week,
-            "DoNothingBaseline": wl_next
-        })
-
-        wl = wl_next
-
-    return pd.DataFrame(future_data)
-
-# Simulate 'Do Nothing' Baseline
-baseline_future = simulate_baseline(service_df, weeks_ahead=52)
-
-# Simulate Forecast with Initiatives
-future = simulate_future(service_df, weeks_ahead=52, initiatives=initiatives)
+    # Forecast weeks are all beyond the actuals, so the percentiles are fixed
+    clock_start_65 = int(historic["ClockStarts_52+_weeks"].dropna().quantile(0.65))
+    clock_stop_65 = int(historic["ClockStops_52+_weeks"].dropna().quantile(0.65))
+
+    next_weeks = start_date + pd.to_timedelta(np.arange(1, weeks_ahead + 1), unit="W")
+
+    # Per-week capacity change from all initiatives active in that week
+    adjustments = active_initiatives(next_weeks, starts, ends) @ changes
+
+    # The first forecast week uses the last actual clock stops in both scenarios
+    adjustments[0] = 0
+    base_clock_stops = np.full(weeks_ahead, clock_stop_65, dtype=np.int64)
+    base_clock_stops[0] = last_actual_row["ClockStops_52+_weeks"]
+    init_clock_stops = base_clock_stops + adjustments
+    clock_starts = np.full(weeks_ahead, clock_start_65, dtype=np.int64)
+    clock_starts[-1] = 0
+
+    # Forecast week index of each reset that lands on a forecast week; later resets win
+    reset_values = {}
+    for reset_date, reset_value in resets:
+        if reset_date:
+            offset = (reset_date - start_date.date()).days
+            if offset % 7 == 0 and 1 <= offset // 7 <= weeks_ahead:
+                reset_values[offset // 7 - 1] = reset_value
+
+    # Step through plain ints; indexing the arrays would box a NumPy scalar per access
+    weekly_inputs = zip(base_clock_stops.tolist(), init_clock_stops.tolist(), clock_starts.tolist())
+    baseline = np.empty(weeks_ahead, dtype=np.int64)
+    simulated = np.empty(weeks_ahead, dtype=np.int64)
+    for i, (base_clock_stop, init_clock_stop, clock_start) in enumerate(weekly_inputs):
+        # Apply resets if dates match (initiative scenario only)
+        if i in reset_values:
+            wl_init = reset_values[i]
+
+        wl_base = max(0, wl_base - base_clock_stop) + clock_start
+        wl_init = max(0, wl_init - init_clock_stop) + clock_start
+        baseline[i] = wl_base
+        simulated[i] = wl_init
+
+    baseline_future = pd.DataFrame({
+        "WeekCommencing": next_weeks,
+        "DoNothingBaseline": baseline
+    })
+    future = pd.DataFrame({
+        "WeekCommencing": next_weeks,
+        "Simulated_WaitingList": simulated
+    })
+    return baseline_future, future
+
+# With no initiatives or resets the forecast depends only on the service's actuals,
+# so every service is simulated once up front and switching service is instant.
+# Only the latest day is kept; shared across sessions, so callers must copy the frames
+@st.cache_resource(max_entries=1)
+def precompute_forecasts(path, today, weeks_ahead):
+    no_dates = np.array([], dtype="datetime64[ns]")
+    no_changes = np.array([], dtype=np.int64)
+
+    forecasts = {}
+    for entity, group in load_service_groups(path).items():
+        entity_historic = group[group["WeekCommencing"] < today]
+        if not entity_historic.empty:
+            forecasts[entity] = simulate_both(entity_historic, weeks_ahead, no_dates, no_dates, no_changes)
+    return forecasts
+
+# Simulate 'Do Nothing' Baseline and Forecast with Initiatives
+resets = [(reset_date_1, reset_value_1), (reset_date_2, reset_value_2)]
+if initiatives or reset_date_1 or reset_date_2:
+    baseline_future, future = simulate_both(
+        historic,
+        weeks_ahead=52,
+        starts=initiative_starts,
+        ends=initiative_ends,
+        changes=initiative_changes,
+        resets=resets
+    )
+else:
+    baseline_future, future = (
+        frame.copy() for frame in precompute_forecasts("data_source_branch4.xlsx", today, 52)[selected_service]
+    )
 
 # --- Plot Actuals + Forecast ---
 fig = go.Figure()
@@ -252,9 +283,14 @@ fig.add_trace(go.Scatter(
 ))
 
 # Initiative Markers
+future_weeks = future["WeekCommencing"].to_numpy()
 for item in initiatives:
-    future["date_diff"] = (future["WeekCommencing"] - item["start"]).abs()
-    closest = future.loc[future["date_diff"].idxmin()]
+    # Closest forecast week to the start: the neighbours either side of the insertion point
+    start = np.datetime64(item["start"], "ns")
+    idx = min(np.searchsorted(future_weeks, start), len(future_weeks) - 1)
+    if idx > 0 and start - future_weeks[idx - 1] <= abs(future_weeks[idx] - start):
+        idx -= 1
+    closest = future.iloc[idx]
     x_val = closest["WeekCommencing"]
     y_val = closest["Simulated_WaitingList"]
 
@@ -314,21 +350,25 @@ fig.update_layout(
 st.plotly_chart(fig, use_container_width=True)  # Stretch chart to full width
 
 # --- Combine actuals and forecast for download ---
-download_df = pd.concat([
-    historic[["WeekCommencing", "Over52Weeks"]]\
-        .rename(columns={"Over52Weeks": "Actual_WaitingList"}),
-    future[["WeekCommencing", "Simulated_WaitingList"]]
-], ignore_index=True)
-
-def get_active_initiatives(week):
-    active = []
-    for i in initiatives:
-        if i["start"] <= week and ("end" not in i or week <= i["end"]):
-            label = f"{i['name']} ({i['change']:+})"
-            active.append(label)
-    return "; ".join(active) if active else ""
-
-download_df["Initiatives_Applied"] = download_df["WeekCommencing"].apply(get_active_initiatives)
+download_df = pd.DataFrame({
+    "WeekCommencing": np.concatenate([
+        historic["WeekCommencing"].to_numpy(),
+        future["WeekCommencing"].to_numpy()
+    ]),
+    "Actual_WaitingList": np.concatenate([
+        historic["Over52Weeks"].to_numpy(dtype=float),
+        np.full(len(future), np.nan)
+    ]),
+    "Simulated_WaitingList": np.concatenate([
+        np.full(len(historic), np.nan),
+        future["Simulated_WaitingList"].to_numpy(dtype=float)
+    ])
+})
+
+download_df["Initiatives_Applied"] = [
+    "; ".join(label for label, is_active in zip(initiative_labels, row) if is_active)
+    for row in active_initiatives(download_df["WeekCommencing"], initiative_starts, initiative_ends)
+]
 
 # --- CSV Download Button ---
 st.download_button(
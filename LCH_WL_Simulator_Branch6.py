@@ -11,16 +11,28 @@ Author: Gary.white; gary.white@opelconsultancy.net
 
 # ---Import Required Libraries---
 from datetime import datetime, date
+import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
 
+from _sim import run_sim
+
 # ---Streamlit Page Configuration---
 st.set_page_config(page_title="Waiting List Simulator", layout="wide")
 
 # ---Load Data Source---
-df = pd.read_excel('data_source_main.xlsx')
-df['Week'] = pd.to_datetime(df['Week'])
+@st.cache_data
+def load_data(path):
+    df = pd.read_excel(path)
+    df['Week'] = pd.to_datetime(df['Week'])
+    return df
+
+@st.cache_data
+def load_service_options(path):
+    return [""] + sorted(load_data(path)["Service"].dropna().unique())
+
+df = load_data('data_source_main.xlsx')
 
 # ---Session Setup---
 if "selected_service" not in st.session_state:
@@ -32,7 +44,7 @@ if st.session_state.selected_service == "":
     st.markdown("""Welcome to the simulation tool for projecting >52 week breaches.""")
 
     # Dropdown
-    service_options = [""] + sorted(df["Service"].dropna().unique())
+    service_options = load_service_options('data_source_main.xlsx')
     selected_service = st.selectbox("🏥 Select a service to view", options=service_options)
 
     if selected_service:
@@ -54,7 +66,7 @@ st.markdown("""This simulation uses demand and capacity data to project
             waiting list impact over time.""")
 
 # ---Filter Data for Selected Service---
-df = df[df["Service"] == selected_service]
+df = df[df["Service"] == selected_service].sort_values("Week")
 
 # ---Sidebar Controls---
 st.sidebar.title("Simulation Controls")
@@ -95,35 +107,32 @@ show_comparison = st.sidebar.checkbox(
 )
 
 # ---Apply Initiative Capacity Adjustments---
-df['initiative_Capacity_Adjustment'] = 0
-for initiative_date, capacity_boost in initiative_events:
-    df.loc[df['Week'] >= initiative_date, 'initiative_Capacity_Adjustment'] += capacity_boost
+# Each boost starts at the first week on or after its date and carries on
+weeks = df['Week'].to_numpy()
+event_dates = np.array([d for d, _ in initiative_events], dtype='datetime64[ns]')
+event_boosts = np.array([b for _, b in initiative_events], dtype=np.int64)
+capacity_delta = np.zeros(len(weeks) + 1, dtype=np.int64)
+np.add.at(capacity_delta, np.searchsorted(weeks, event_dates, side='left'), event_boosts)
+df['initiative_Capacity_Adjustment'] = np.cumsum(capacity_delta[:-1])
 
 # ---Apply All Adjustments To Demand & Capacity---
 weekly_demand = df['Starts']
 weekly_capacity = df['Stops'] + df['initiative_Capacity_Adjustment']
-weeks_to_simulate = len(df)
 
 # ---Simulate 'With Initiatives' Trajectory---
-waiting_list = [initial_waiting_list]
-for week in range(weeks_to_simulate):
-    demand = weekly_demand.iloc[week]
-    capacity = weekly_capacity.iloc[week]
-    net_change = demand - capacity
-    new_waiting_list = max(waiting_list[-1] + net_change, 0)
-    waiting_list.append(new_waiting_list)
-df['Simulated_Waiting_List'] = waiting_list[1:]
+df['Simulated_Waiting_List'] = run_sim(
+    float(initial_waiting_list),
+    weekly_demand.to_numpy(dtype=float),
+    weekly_capacity.to_numpy(dtype=float)
+)
 
 # ---Simulate 'Do Nothing' Trajectory---
 weekly_capacity_no_initiatives = df['Stops']
-waiting_list_no_initiatives = [initial_waiting_list]
-for week in range(weeks_to_simulate):
-    demand = weekly_demand.iloc[week]
-    capacity = weekly_capacity_no_initiatives.iloc[week]
-    net_change = demand - capacity
-    new_waiting_list = max(waiting_list_no_initiatives[-1] + net_change, 0)
-    waiting_list_no_initiatives.append(new_waiting_list)
-df['Waiting_List_No_Initiatives'] = waiting_list_no_initiatives[1:]
+df['Waiting_List_No_Initiatives'] = run_sim(
+    float(initial_waiting_list),
+    weekly_demand.to_numpy(dtype=float),
+    weekly_capacity_no_initiatives.to_numpy(dtype=float)
+)
 
 # ---Prepare Actuals Line---
 if 'Actual Waiting List' not in df.columns:
@@ -133,8 +142,9 @@ actuals_df = df[df['Actual Waiting List'].notna()]
 # ---Visualise Waiting List Trajectory---
 fig = go.Figure()
 today = datetime.today()
-past_df = df[df['Week'] < today]
-future_df = df[df['Week'] >= today]
+past_mask = df['Week'].to_numpy() < np.datetime64(today)
+past_df = df[past_mask]
+future_df = df[~past_mask]
 
 # Past trajectory using actuals from 'Over52Weeks'
 fig.add_trace(go.Scatter(
@@ -215,10 +225,10 @@ fig.add_annotation(
 locum_colors = ['red', 'orange', 'green', 'purple', 'blue']
 for i, (initiative_date, capacity_boost) in enumerate(initiative_events, start=1):
     if capacity_boost > 0:
-        matching_weeks = df[df['Week'] >= initiative_date]
-        if not matching_weeks.empty:
-            marker_date = matching_weeks.iloc[0]['Week']
-            y_value = matching_weeks.iloc[0]['Simulated_Waiting_List']
+        idx = np.searchsorted(weeks, np.datetime64(initiative_date, 'ns'), side='left')
+        if idx < len(weeks):
+            marker_date = df['Week'].iloc[idx]
+            y_value = df['Simulated_Waiting_List'].iloc[idx]
             fig.add_trace(go.Scatter(
                 x=[marker_date],
                 y=[y_value],
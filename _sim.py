@@ -0,0 +1,23 @@
+"""
+Waiting List Simulation Kernel
+------------------------------
+Shared weekly waiting list recurrence for the Streamlit simulators. Each
+week the list grows by demand and shrinks by capacity, and can never fall
+below zero. That makes every week depend on the one before, so the loop is
+compiled with Numba rather than vectorised.
+
+Author: Gary.white; gary.white@opelconsultancy.net
+"""
+
+import numba
+import numpy as np
+
+
+@numba.njit(cache=True)
+def run_sim(initial, demand, capacity):
+    out = np.empty(len(demand))
+    wl = initial
+    for i in range(len(demand)):
+        wl = max(wl + demand[i] - capacity[i], 0.0)
+        out[i] = wl
+    return out
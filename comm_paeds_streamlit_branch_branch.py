@@ -11,18 +11,26 @@ Author: Gary.white; gary.white@opelconsultancy.net
 
 # ---Import Required Libraries---
 from datetime import datetime, date
+import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
 
+from _sim import run_sim
+
 # ---Streamlit Page Configuration---
 st.set_page_config(page_title="Waiting List Simulator", layout="wide")
 
 # ---Load Data Source---
-df = pd.read_excel('data_source_testv0.2.xlsx')
+@st.cache_data
+def load_data(path):
+    df = pd.read_excel(path)
+
+    # ---Ensure 'Week' Column is in datetime format---
+    df['Week'] = pd.to_datetime(df['Week'])
+    return df.sort_values('Week')
 
-# ---Ensure 'Week' Column is in datetime format---
-df['Week'] = pd.to_datetime(df['Week'])
+df = load_data('data_source_testv0.2.xlsx')
 
 # ---Sidebar Controls---
 st.sidebar.title("Simulation Controls")
@@ -81,36 +89,33 @@ st.markdown("""This simulation uses demand and capacity data to project
 waiting list impact over time.""")
 
 # ---Apply Locum-Specific Capacity Adjustments---
-df['Locum_Capacity_Adjustment'] = 0
-for locum_date, capacity_boost in locum_events:
-    df.loc[df['Week'] >= locum_date, 'Locum_Capacity_Adjustment'] += capacity_boost
+# Each boost starts at the first week on or after its date and carries on
+weeks = df['Week'].to_numpy()
+event_dates = np.array([d for d, _ in locum_events], dtype='datetime64[ns]')
+event_boosts = np.array([b for _, b in locum_events], dtype=np.int64)
+capacity_delta = np.zeros(len(weeks) + 1, dtype=np.int64)
+np.add.at(capacity_delta, np.searchsorted(weeks, event_dates, side='left'), event_boosts)
+df['Locum_Capacity_Adjustment'] = np.cumsum(capacity_delta[:-1])
 
 # ---Apply All Adjustments To Demand & Capacity---
 weekly_demand = df['Starts'] + demand_adjustment
 weekly_capacity = df['Stops'] + capacity_adjustment + df['Locum_Capacity_Adjustment']
-weeks_to_simulate = len(df)
-
-# ---Initialise Waiting List Simulation---
-waiting_list = [initial_waiting_list]
 
-# ---Run Simulation Over Each Week---
-for week in range(weeks_to_simulate):
-    demand = weekly_demand.iloc[week]
-    capacity = weekly_capacity.iloc[week]
-    net_change = demand - capacity
-    new_waiting_list = max(waiting_list[-1] + net_change, 0)
-    waiting_list.append(new_waiting_list)
-
-# ---Store Simulation Results In DataFrame---
-df['Simulated_Waiting_List'] = waiting_list[1:]
+# ---Run Simulation Over Each Week And Store Results In DataFrame---
+df['Simulated_Waiting_List'] = run_sim(
+    float(initial_waiting_list),
+    weekly_demand.to_numpy(dtype=float),
+    weekly_capacity.to_numpy(dtype=float)
+)
 
 # ---Visualise Waiting List Trajectory with Past vs Future Split---
 fig = go.Figure()
 today = datetime.today()
 
 # Split the DataFrame
-past_df = df[df['Week'] < today]
-future_df = df[df['Week'] >= today]
+past_mask = df['Week'].to_numpy() < np.datetime64(today)
+past_df = df[past_mask]
+future_df = df[~past_mask]
 
 # Past trajectory
 fig.add_trace(go.Scatter(
@@ -163,10 +168,10 @@ fig.add_annotation(
 locum_colors = ['red', 'orange', 'green', 'purple', 'blue']
 for i, (locum_date, capacity_boost) in enumerate(locum_events, start=1):
     if capacity_boost > 0:
-        matching_weeks = df[df['Week'] >= locum_date]
-        if not matching_weeks.empty:
-            marker_date = matching_weeks.iloc[0]['Week']
-            y_value = matching_weeks.iloc[0]['Simulated_Waiting_List']
+        idx = np.searchsorted(weeks, np.datetime64(locum_date, 'ns'), side='left')
+        if idx < len(weeks):
+            marker_date = df['Week'].iloc[idx]
+            y_value = df['Simulated_Waiting_List'].iloc[idx]
             fig.add_trace(go.Scatter(
                 x=[marker_date],
                 y=[y_value],
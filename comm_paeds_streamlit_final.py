@@ -2,6 +2,7 @@
 simulation for Community Paeds at Leeds Community Health'''
 
 # Import libraries
+import numpy as np
 import pandas as pd
 import streamlit as st
 
@@ -33,8 +34,12 @@ st.title("Community Paediatrics >52 Weeks Waiting List Simulation")
 
 st.markdown("This simulation uses demand and capacity data from Excel to project waiting list impact over time.")
 
-# Load data source (excel file in this test)
-df = pd.read_excel('data_source_test.xlsx')
+# Load data source (excel file in this test), cached across reruns
+@st.cache_data
+def load_data(path):
+    return pd.read_excel(path)
+
+df = load_data('data_source_test.xlsx')
 
 # Define Inputs
 daily_demand = df['Demand'] + demand_adjustment # patients per day
@@ -42,17 +47,16 @@ daily_capacity = df['Capacity'] + capacity_adjustment # appointments available p
 days_to_simulate = len(df)
 
 # Simulate Waiting List Over Time
-waiting_list = [initial_waiting_list]
+net_changes = (daily_demand - daily_capacity).to_numpy(dtype=float)  # float64 array
+waiting_list = np.empty(days_to_simulate, dtype=np.float64)          # one slot per day
+wl = float(initial_waiting_list)
 
 for day in range(days_to_simulate):     # loops through each row of the input file
-    demand = daily_demand.iloc[day]     # scalar value
-    capacity = daily_capacity.iloc[day] # scalar value
-    net_change = demand - capacity      # scalar result
-    new_waiting_list = max(waiting_list[-1] + net_change, 0)
-    waiting_list.append(new_waiting_list)
+    wl = max(wl + net_changes[day], 0.0)
+    waiting_list[day] = wl
 
 # Add results to DataFrame
-df['Simulated_Waiting_List'] = waiting_list[1:]  # skip initial value
+df['Simulated_Waiting_List'] = waiting_list
 
 # Visualise the Impact
 st.area_chart(df.set_index('Day')['Simulated_Waiting_List'])